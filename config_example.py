@@ -20,6 +20,7 @@ DB_CONFIG = {
     'password': os.getenv('DB_PASSWORD', ''),
     'sslmode': os.getenv('DB_SSLMODE', 'prefer'),  # prefer, require, disable
 }
+DB_DRIVER = os.getenv('DB_DRIVER', 'asyncpg')  # asyncpg, or psycopg2 for compatibility
 
 # Server Configuration
 SERVER_NAME = "postgres-nl-query-server"
@@ -27,6 +28,7 @@ LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR
 
 # Query Configuration
 MAX_RESULTS = 1000  # Maximum number of rows to return
+BYTE_BUDGET = 8 * 1024 * 1024  # Maximum size in bytes of the returned rows (as JSON)
 QUERY_TIMEOUT = 240  # Query timeout in seconds
 
 # Schema Configuration
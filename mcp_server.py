@@ -1,12 +1,31 @@
 import os
 import json
+import base64
+import time
+import asyncio
+import re
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+import asyncpg
 import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
+import sqlglot
+from sqlglot import exp
+import orjson
 from fastmcp import FastMCP
+from fastmcp.tools import ToolResult
 from pydantic import BaseModel, Field
+from pydantic_core import to_jsonable_python
 
 # Load environment variables
 load_dotenv()
@@ -14,24 +33,378 @@ load_dotenv()
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# sqlglot warns whenever it falls back to a generic Command (SHOW, EXPLAIN, ...)
+logging.getLogger('sqlglot').setLevel(logging.ERROR)
+
+# Database driver: 'asyncpg' (default) or 'psycopg2' for compatibility
+DB_DRIVER = os.getenv('DB_DRIVER', 'asyncpg').lower()
+
+# Connection pool sizing
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '20'))
+
+# Query configuration
+MAX_RESULTS = int(os.getenv('MAX_RESULTS', '1000'))  # Maximum number of rows to return
+BYTE_BUDGET = int(os.getenv('BYTE_BUDGET', str(8 * 1024 * 1024)))  # Maximum JSON size of the returned rows
+QUERY_TIMEOUT = int(os.getenv('QUERY_TIMEOUT', '240'))  # seconds
+FETCH_SIZE = 100  # Rows in the first fetch of a result; later fetches are sized to BYTE_BUDGET
+
+PRE_PING_TIMEOUT = 5  # seconds to wait for a pooled connection to answer SELECT 1
+STATEMENT_CACHE_SIZE = int(os.getenv('STATEMENT_CACHE_SIZE', '1024'))  # Prepared statements kept per connection
+
+# Statement types that modify the database, and the keyword reported when one is blocked.
+# Looked up by name: older sqlglot releases lack Grant/Revoke and call Alter AlterTable
+WRITE_OPERATIONS = tuple(
+    (getattr(exp, name), keyword)
+    for name, keyword in (
+        ('Insert', 'INSERT'),
+        ('Update', 'UPDATE'),
+        ('Delete', 'DELETE'),
+        ('Merge', 'MERGE'),
+        ('Drop', 'DROP'),
+        ('Alter', 'ALTER'),
+        ('AlterTable', 'ALTER'),
+        ('Create', 'CREATE'),
+        ('TruncateTable', 'TRUNCATE'),
+        ('Grant', 'GRANT'),
+        ('Revoke', 'REVOKE'),
+        ('Copy', 'COPY'),
+    )
+    if hasattr(exp, name)
+)
+
+# The same keywords as whole words, for statements sqlglot only parses as a generic Command
+WRITE_KEYWORD_PATTERN = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|MERGE|DROP|ALTER|CREATE|TRUNCATE|GRANT|REVOKE|COPY)\b', re.IGNORECASE
+)
+
+# Generic Commands that may run besides queries; every other statement is rejected
+ALLOWED_COMMANDS = ('EXPLAIN', 'SHOW')
+
+# Schema configuration
+SCHEMA_CACHE_TTL = int(os.getenv('SCHEMA_CACHE_TTL', '300'))  # seconds
+AUTO_REFRESH_SCHEMA = os.getenv('AUTO_REFRESH_SCHEMA', 'true').lower() in ('1', 'true', 'yes')
+
+# One row per column of every table, view and foreign table in the public schema.
+# Reads pg_catalog directly; the information_schema views are much slower to plan and run.
+SCHEMA_QUERY = """
+    SELECT 
+        c.relname,
+        a.attname,
+        format_type(a.atttypid, a.atttypmod),
+        NOT a.attnotnull,
+        pg_get_expr(d.adbin, d.adrelid),
+        CASE
+            WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0 THEN a.atttypmod - 4  -- char(n), varchar(n)
+            WHEN a.atttypid IN (1560, 1562) AND a.atttypmod > 0 THEN a.atttypmod  -- bit(n), varbit(n)
+        END
+    FROM pg_catalog.pg_attribute a
+    JOIN pg_catalog.pg_class c ON a.attrelid = c.oid
+    JOIN pg_catalog.pg_namespace n ON c.relnamespace = n.oid
+    LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE n.nspname = 'public'
+        AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND a.attnum > 0
+        AND NOT a.attisdropped
+    ORDER BY c.relname, a.attnum
+"""
+SCHEMA_STATEMENT = 'mcp_schema_v1'  # Name SCHEMA_QUERY is prepared under on psycopg2 connections
+
+# Errors raised when a query runs past QUERY_TIMEOUT
+QUERY_TIMEOUT_ERRORS = (
+    asyncpg.exceptions.QueryCanceledError,
+    psycopg2.errors.QueryCanceled,
+    asyncio.TimeoutError,
+)
+
+# Errors that mean the schema changed under us (e.g. DDL run by another client)
+SCHEMA_CHANGED_ERRORS = (
+    asyncpg.exceptions.UndefinedTableError,
+    asyncpg.exceptions.UndefinedColumnError,
+    psycopg2.errors.UndefinedTable,
+    psycopg2.errors.UndefinedColumn,
+)
 
 class SQLQuery(BaseModel):
     """Input model for SQL query execution tool."""
     sql_query: str = Field(..., description="SQL query to execute against the PostgreSQL database")
     description: Optional[str] = Field(None, description="Optional description of what the query does")
+    page_token: Optional[str] = Field(None, description="next_page_token from a previous result of the same query, to fetch the following page")
 
 class NaturalLanguageQuery(BaseModel):
     """Input model for natural language query tool."""
     query: str = Field(..., description="Natural language description of what you want to query from the database")
     context: Optional[str] = Field(None, description="Optional context or additional information to help with SQL generation")
 
-class QueryResult(BaseModel):
+# A plain dataclass: results come from the driver, so construction needs no validation
+@dataclass
+class QueryResult:
     """Output model for query results."""
     sql_query: str
-    results: List[Dict[str, Any]]
+    results: List[List[Any]]
     row_count: int
     execution_time: float
+    columns: List[str] = field(default_factory=list)
     error: Optional[str] = None
+    next_page_token: Optional[str] = None
+
+def to_tool_result(result: QueryResult) -> ToolResult:
+    """
+    Serialize a QueryResult for the MCP response with orjson.
+    
+    Returning a plain model makes FastMCP serialize it with pydantic several times over;
+    this encodes the text content once in C. Values neither serializer knows
+    (asyncpg BitString, Range, ...) are rendered with str() in both outputs.
+    """
+    return ToolResult(
+        content=orjson.dumps(result, default=str).decode('utf-8'),
+        # vars() rather than asdict(), which would deep-copy every row
+        structured_content=to_jsonable_python(vars(result), fallback=str)
+    )
+
+@lru_cache(maxsize=512)
+def parse_sql(sql_query: str) -> Tuple[Optional[exp.Expression], ...]:
+    """
+    Parse SQL into its statements, caching the result for repeated queries.
+    
+    The returned trees are shared between callers and must not be modified.
+    Raises sqlglot.errors.SqlglotError (ParseError or TokenError) for invalid SQL.
+    """
+    return tuple(sqlglot.parse(sql_query, dialect='postgres'))
+
+def describe_parse_error(error: sqlglot.errors.SqlglotError) -> str:
+    """Describe a sqlglot error in plain text; str() of a ParseError has terminal escape codes."""
+    details = getattr(error, 'errors', None)
+    if details:
+        return f"{details[0]['description']} (line {details[0]['line']}, column {details[0]['col']})"
+    return str(error)
+
+def is_allowed_statement(statement: exp.Expression) -> bool:
+    """Whether a statement is of a kind that may be run: a query, or one of ALLOWED_COMMANDS."""
+    if isinstance(statement, exp.Command):
+        return statement.name.upper() in ALLOWED_COMMANDS
+    # Statements sqlglot doesn't know can parse as odd nodes (DEALLOCATE ALL is an Alias)
+    return isinstance(statement, exp.Query)
+
+def find_write_operation(sql_query: str, statement: exp.Expression) -> Optional[str]:
+    """Name the operation in a parsed statement that would modify the database, if there is one."""
+    if isinstance(statement, exp.Command):
+        # EXPLAIN, SHOW, DO, etc. aren't parsed any further, so check their words
+        match = WRITE_KEYWORD_PATTERN.search(sql_query)
+        return match.group(1).upper() if match else None
+    
+    # Walk the whole tree so data-modifying CTEs are caught too
+    for node in statement.walk():
+        for expression_type, keyword in WRITE_OPERATIONS:
+            if isinstance(node, expression_type):
+                return keyword
+        if isinstance(node, exp.Select) and node.args.get('into'):
+            return 'SELECT INTO'
+    return None
+
+def get_identifier_name(identifier: exp.Identifier) -> str:
+    """Get a name as PostgreSQL stores it: unquoted identifiers fold to lower case."""
+    return identifier.this if identifier.quoted else identifier.this.lower()
+
+def is_star(projection: exp.Expression) -> bool:
+    """Whether a select-list entry is * or table.*."""
+    return isinstance(projection, exp.Star) or (
+        isinstance(projection, exp.Column) and isinstance(projection.this, exp.Star)
+    )
+
+def get_output_name(projection: exp.Expression) -> Optional[str]:
+    """Get the name of the output column a select-list entry produces, if it is known."""
+    if isinstance(projection, exp.Alias):
+        return get_identifier_name(projection.args['alias'])
+    if isinstance(projection, exp.Column) and isinstance(projection.this, exp.Identifier):
+        return get_identifier_name(projection.this)
+    # Unaliased expressions get names like "count" or "?column?"
+    return None
+
+def is_same_column(a: exp.Column, b: exp.Column) -> bool:
+    """Whether two column references can only mean the same input column."""
+    if not isinstance(a.this, exp.Identifier) or not isinstance(b.this, exp.Identifier):
+        return False
+    if get_identifier_name(a.this) != get_identifier_name(b.this):
+        return False
+    # PostgreSQL only accepts an unqualified name that is unambiguous, so it matches any table
+    a_table, b_table = a.args.get('table'), b.args.get('table')
+    return a_table is None or b_table is None or get_identifier_name(a_table) == get_identifier_name(b_table)
+
+def resolve_order_key(ast: exp.Query, expression: exp.Expression) -> Optional[str]:
+    """Resolve an ORDER BY item to the name of the output column it sorts by, if it is one."""
+    projections = ast.selects
+    names = [get_output_name(projection) for projection in projections]
+    
+    if isinstance(expression, exp.Literal):
+        # ORDER BY 2 refers to the second output column
+        if expression.is_int and 0 < int(expression.name) <= len(projections):
+            return names[int(expression.name) - 1]
+        return None
+    if not isinstance(expression, exp.Column) or not isinstance(expression.this, exp.Identifier):
+        return None
+    
+    # An unqualified name refers to an output column before an input column
+    name = get_identifier_name(expression.this)
+    if not expression.args.get('table') and name in names:
+        return name
+    
+    # Otherwise it is an input column, which must be selected itself, possibly under an alias
+    matches = [
+        output for projection, output in zip(projections, names)
+        if isinstance(projection.unalias(), exp.Column) and is_same_column(projection.unalias(), expression)
+    ]
+    if matches:
+        return matches[0] if len(matches) == 1 else None
+    
+    # SELECT * from a single table or subquery outputs every one of its columns
+    source = next((node.this for node in ast.iter_expressions() if isinstance(node, exp.From)), None)
+    if (not isinstance(ast, exp.Select) or source is None or ast.args.get('joins') or ast.args.get('laterals')
+            or not any(is_star(projection) for projection in projections)):
+        return None
+    table = expression.args.get('table')
+    if table is not None:
+        source_name = source.args.get('alias').this if source.args.get('alias') else source.this
+        if not isinstance(source_name, exp.Identifier) or get_identifier_name(source_name) != get_identifier_name(table):
+            return None
+    return name
+
+def get_order_keys(ast: exp.Query) -> Optional[Tuple[List[str], bool]]:
+    """Get the output columns a query is ordered by, and whether they descend, if usable for keyset pagination."""
+    order = ast.args.get('order')
+    if not order:
+        return None
+    
+    names = [get_output_name(projection) for projection in ast.selects]
+    has_star = any(is_star(projection) for projection in ast.selects)
+    keys = []
+    directions = set()
+    for ordered in order.expressions:
+        key = resolve_order_key(ast, ordered.this)
+        # The outer query refers to the key by name, so that name must be a single,
+        # known output column of the subquery
+        if key is None or names.count(key) > 1 or (has_star and key in names):
+            return None
+        keys.append(key)
+        directions.add(bool(ordered.args.get('desc')))
+    
+    # A row comparison can only follow a single sort direction
+    if len(directions) != 1:
+        return None
+    return keys, directions.pop()
+
+def get_query_fingerprint(sql_query: str) -> str:
+    """Identify a query so page tokens can't be replayed against a different one."""
+    return hashlib.sha1(sql_query.strip().encode('utf-8')).hexdigest()[:16]
+
+def encode_page_token(sql_query: str, values: List[Any]) -> str:
+    """Encode the sort-key values of the last returned row as an opaque page token."""
+    payload = json.dumps({'q': get_query_fingerprint(sql_query), 'v': values}, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_page_token(sql_query: str, page_token: str) -> List[Any]:
+    """Decode a page token back into the sort-key values to resume after."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(page_token.encode('ascii')))
+    except ValueError:
+        raise ValueError("Invalid page_token.")
+    if not isinstance(payload, dict) or not isinstance(payload.get('v'), list):
+        raise ValueError("Invalid page_token.")
+    if payload.get('q') != get_query_fingerprint(sql_query):
+        raise ValueError("This page_token was issued for a different query.")
+    return payload['v']
+
+def bound_query(sql_query: str, ast: exp.Expression, page_token: Optional[str] = None) -> Tuple[str, Optional[Tuple[List[str], bool]]]:
+    """
+    Wrap a SELECT without a LIMIT so it returns at most MAX_RESULTS + 1 rows.
+    
+    The extra row tells the caller there is another page. When the query is ordered by
+    plain columns in one direction, those columns are returned as the keyset, and a
+    page_token resumes after the row it was issued for. Queries that already have a
+    LIMIT, and statements other than queries, run unchanged.
+    """
+    if not isinstance(ast, exp.Query) or ast.args.get('limit') or ast.args.get('fetch'):
+        if page_token:
+            raise ValueError("page_token can only be used with the query that returned it.")
+        return sql_query, None
+    
+    order_keys = get_order_keys(ast)
+    columns = []
+    where = ""
+    order_by = ""
+    if order_keys:
+        keys, descending = order_keys
+        column_expressions = [exp.column(key, table='_sub', quoted=True) for key in keys]
+        columns = [column.sql(dialect='postgres') for column in column_expressions]
+        orderings = []
+        for column, ordered in zip(column_expressions, ast.args['order'].expressions):
+            # Copy each ORDER BY item so DESC and NULLS FIRST/LAST carry over to the outer query
+            ordering = ordered.copy()
+            ordering.set('this', column)
+            orderings.append(ordering.sql(dialect='postgres'))
+        order_by = " ORDER BY " + ", ".join(orderings)
+    
+    if page_token:
+        values = decode_page_token(sql_query, page_token)
+        if not order_keys or len(values) != len(columns):
+            raise ValueError("Invalid page_token.")
+        # Untyped literals let PostgreSQL coerce each value to its column's type
+        literals = [exp.convert(value).sql(dialect='postgres') for value in values]
+        where = f" WHERE ({', '.join(columns)}) {'<' if descending else '>'} ({', '.join(literals)})"
+    
+    # Keep the user's SQL text as-is; newlines guard against trailing comments
+    inner = sql_query.strip().rstrip(';')
+    return f"SELECT * FROM (\n{inner}\n) AS _sub{where}{order_by} LIMIT {MAX_RESULTS + 1}", order_keys
+
+def get_row_limit(ast: exp.Expression) -> Optional[int]:
+    """Get the most rows a statement can return once bound_query has wrapped it, if that is known."""
+    if not isinstance(ast, exp.Query):
+        return None
+    limit = ast.args.get('limit') or ast.args.get('fetch')
+    if limit is None:
+        # bound_query adds the LIMIT
+        return MAX_RESULTS + 1
+    count = limit.args.get('count') if isinstance(limit, exp.Fetch) else limit.expression
+    if isinstance(count, exp.Literal) and count.is_int:
+        return int(count.name)
+    # LIMIT ALL, LIMIT $1, LIMIT (SELECT ...)
+    return None
+
+def get_fetch_size(row_count: int, size: int, max_rows: int) -> int:
+    """
+    Get how many rows to fetch next, given the rows and bytes of the result read so far.
+    
+    After the first FETCH_SIZE rows, ask for as many as should still fit in BYTE_BUDGET
+    at the average row size so far (plus the one that would go over it), so a page of
+    narrow rows takes a round trip or two while wide rows never pull much more than
+    the budget into memory.
+    """
+    remaining = max_rows - row_count
+    if row_count == 0:
+        return min(FETCH_SIZE, remaining)
+    average = size / row_count
+    return max(1, min(remaining, int((BYTE_BUDGET - size) / average) + 1))
+
+class SessionConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that applies the session defaults to each new connection."""
+    
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        # Explicit rather than inheriting whatever default the server is configured with.
+        # Every transaction starts READ ONLY: the server enforces that nothing is written,
+        # and the pool rolls back whatever transaction is left open when a connection returns
+        conn.set_session(
+            isolation_level=psycopg2.extensions.ISOLATION_LEVEL_READ_COMMITTED,
+            readonly=True
+        )
+        # Let the server cancel runaway queries itself
+        cursor = conn.cursor()
+        cursor.execute("SET statement_timeout = %s", (QUERY_TIMEOUT * 1000,))
+        # Parse and plan the catalog query once per connection instead of on every load
+        cursor.execute(f"PREPARE {SCHEMA_STATEMENT} AS {SCHEMA_QUERY}")
+        cursor.close()
+        conn.commit()
+        return conn
 
 class DatabaseManager:
     """Manages PostgreSQL database connections and operations."""
@@ -44,122 +417,540 @@ class DatabaseManager:
             'user': os.getenv('DB_USER', 'postgres'),
             'password': os.getenv('DB_PASSWORD', ''),
         }
+        self.driver = DB_DRIVER
+        # Pools are created on first use so importing the module doesn't need a live database
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises instead of waiting when exhausted, so cap borrowers
+        self._pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+        self.async_pool = None
+        self._async_pool_lock = None
+        # psycopg2 prepared statements: statement hashes seen so far, and per connection
+        # an LRU of {statement hash: prepared statement name}
+        self._seen_statements = OrderedDict()
+        self._prepared_statements = weakref.WeakKeyDictionary()
+        self._statements_lock = threading.Lock()
+        # Schema cache: (schema_text, tables) plus the monotonic time it was loaded
+        self._schema_cache = None
+        self._schema_cache_ts = 0
+        self._schema_generation = 0
+        self._schema_load_task = None
+        self._schema_refresh_task = None
+        # Queries currently running, keyed by (sql_query, page_token), so identical
+        # concurrent calls share one execution
+        self._inflight_queries = {}
+    
+    def get_pool(self) -> SessionConnectionPool:
+        """Get the shared connection pool, creating it if needed."""
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    self.pool = SessionConnectionPool(
+                        minconn=POOL_MIN_SIZE,
+                        maxconn=POOL_MAX_SIZE,
+                        **self.connection_params
+                    )
+        return self.pool
     
+    @contextmanager
     def get_connection(self):
-        """Get a database connection."""
+        """Borrow a database connection from the pool."""
+        self._pool_slots.acquire()
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            return conn
+            pool = self.get_pool()
+            conn = pool.getconn()
+            # Pre-ping: a socket that died while idle fails here, not halfway through a query.
+            # Idle connections usually die together, so keep going until one answers; once
+            # the idle ones are used up the pool hands out a brand-new connection.
+            for _ in range(POOL_MAX_SIZE):
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.close()
+                    break
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    logger.warning("Replacing dead pooled connection: %s", e)
+                    pool.putconn(conn, close=True)
+                    conn = pool.getconn()
         except Exception as e:
-            logger.error(f"Failed to connect to database: {e}")
+            self._pool_slots.release()
+            logger.error("Failed to connect to database: %s", e)
+            raise
+        
+        close = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            # Errors the server reported (QueryCanceled, SerializationFailure, ...) carry a
+            # SQLSTATE and leave the connection usable; only drop it when it was lost
+            close = e.pgcode is None
             raise
+        finally:
+            pool.putconn(conn, close=close or bool(conn.closed))
+            self._pool_slots.release()
     
-    def execute_query(self, sql_query: str) -> QueryResult:
-        """Execute a SQL query and return results."""
-        import time
-        start_time = time.time()
+    @staticmethod
+    async def _init_async_connection(conn: asyncpg.Connection):
+        """Decode json/jsonb into Python objects, as psycopg2 does, instead of asyncpg's raw text."""
+        for type_name in ('json', 'jsonb'):
+            await conn.set_type_codec(
+                type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog'
+            )
+    
+    async def get_async_pool(self) -> asyncpg.Pool:
+        """Get the shared asyncpg pool, creating it if needed."""
+        if self.async_pool is None:
+            if self._async_pool_lock is None:
+                self._async_pool_lock = asyncio.Lock()
+            async with self._async_pool_lock:
+                if self.async_pool is None:
+                    try:
+                        self.async_pool = await asyncpg.create_pool(
+                            host=self.connection_params['host'],
+                            port=int(self.connection_params['port']),
+                            database=self.connection_params['database'],
+                            user=self.connection_params['user'],
+                            password=self.connection_params['password'],
+                            min_size=POOL_MIN_SIZE,
+                            max_size=POOL_MAX_SIZE,
+                            command_timeout=QUERY_TIMEOUT,
+                            # Repeated statements skip parse/plan; SQL text is the cache key
+                            statement_cache_size=STATEMENT_CACHE_SIZE,
+                            init=self._init_async_connection,
+                            # Startup parameters, so they survive the RESET ALL done on release
+                            server_settings={
+                                'default_transaction_isolation': 'read committed',
+                                'default_transaction_read_only': 'on',
+                                'statement_timeout': str(QUERY_TIMEOUT * 1000)
+                            }
+                        )
+                    except Exception as e:
+                        logger.error("Failed to connect to database: %s", e)
+                        raise
+        return self.async_pool
+    
+    @asynccontextmanager
+    async def get_async_connection(self):
+        """Borrow an asyncpg connection from the pool."""
+        pool = await self.get_async_pool()
+        conn = await pool.acquire()
+        # Pre-ping, as in get_connection()
+        for _ in range(POOL_MAX_SIZE):
+            try:
+                await conn.execute("SELECT 1", timeout=PRE_PING_TIMEOUT)
+                break
+            except (asyncpg.exceptions.InterfaceError, asyncpg.exceptions.PostgresConnectionError,
+                    OSError, asyncio.TimeoutError) as e:
+                logger.warning("Replacing dead pooled connection: %s", e)
+                conn.terminate()
+                await pool.release(conn)
+                conn = await pool.acquire()
+        
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+    
+    def _fetch_rows_psycopg2(self, sql_query: str) -> List[tuple]:
+        """Run a query on a pooled psycopg2 connection and return plain rows."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql_query)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+    
+    def _fetch_schema_rows_psycopg2(self) -> List[tuple]:
+        """Run the schema query through its prepared statement on a pooled psycopg2 connection."""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Prepared when the pool opened the connection
+                cursor.execute(f"EXECUTE {SCHEMA_STATEMENT}")
+            except psycopg2.errors.InvalidSqlStatementName:
+                # Deallocated since then; prepare it again rather than failing on this
+                # connection for good
+                conn.rollback()
+                cursor.execute(f"PREPARE {SCHEMA_STATEMENT} AS {SCHEMA_QUERY}")
+                cursor.execute(f"EXECUTE {SCHEMA_STATEMENT}")
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+    
+    async def fetch_rows(self, sql_query: str) -> List[tuple]:
+        """Run an internal query with the configured driver and return plain rows."""
+        if self.driver == 'psycopg2':
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._fetch_rows_psycopg2, sql_query)
         
-        # Check if query is read-only
-        sql_upper = sql_query.strip().upper()
-        forbidden_keywords = ['INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'CREATE', 'TRUNCATE', 'GRANT', 'REVOKE']
+        async with self.get_async_connection() as conn:
+            return await conn.fetch(sql_query)
+    
+    def _get_prepared_statement(self, conn, sql_query: str) -> Optional[str]:
+        """Get the name of a prepared statement for a repeated query, preparing it if needed."""
+        key = hashlib.sha1(sql_query.encode('utf-8')).hexdigest()[:16]
+        with self._statements_lock:
+            # Queries seen only once are treated as one-shot and not prepared
+            seen = key in self._seen_statements
+            self._seen_statements[key] = True
+            self._seen_statements.move_to_end(key)
+            if len(self._seen_statements) > STATEMENT_CACHE_SIZE:
+                self._seen_statements.popitem(last=False)
+        if not seen:
+            return None
         
-        for keyword in forbidden_keywords:
-            if keyword in sql_upper:
-                execution_time = time.time() - start_time
-                error_msg = f"This MCP server only allows read-only queries. The query contains '{keyword}' which is not permitted. Please use only SELECT queries to read data from the database."
-                logger.warning(f"Blocked non-read-only query: {sql_query}")
-                return QueryResult(
-                    sql_query=sql_query,
-                    results=[],
-                    row_count=0,
-                    execution_time=execution_time,
-                    error=error_msg
-                )
+        statements = self._prepared_statements.setdefault(conn, OrderedDict())
+        name = statements.get(key)
+        if name is not None:
+            statements.move_to_end(key)
+            return name
         
+        name = f"mcp_{key}"
+        cursor = conn.cursor()
+        cursor.execute(f"PREPARE {name} AS {sql_query}")
+        if len(statements) >= STATEMENT_CACHE_SIZE:
+            _, evicted = statements.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {evicted}")
+        cursor.close()
+        statements[key] = name
+        return name
+    
+    def _forget_prepared_statement(self, conn, name: str):
+        """Deallocate a prepared statement after it failed, e.g. because the table changed."""
+        statements = self._prepared_statements.get(conn)
+        if not statements or conn.closed:
+            return
+        for key, prepared_name in list(statements.items()):
+            if prepared_name == name:
+                del statements[key]
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            conn.rollback()
+            cursor = conn.cursor()
+            cursor.execute(f"DEALLOCATE {name}")
+            cursor.close()
+        except psycopg2.Error:
+            # Broken connections are dropped by get_connection anyway
+            pass
+    
+    def _fetch_results_psycopg2(self, sql_query: str, max_rows: int, is_query: bool, preparable: bool = False) -> Tuple[List[str], List[tuple], bool]:
+        """
+        Execute a user query with psycopg2 and return its column names and rows as tuples.
+        
+        Also returns whether BYTE_BUDGET ran out; if so, the last row is the one that
+        went over the budget. is_query says whether the parsed statement is a query
+        (SELECT, WITH, UNION, ...) rather than a command such as EXPLAIN. Pass
+        preparable only for queries that can't return more than max_rows rows.
+        """
+        with self.get_connection() as conn:
+            prepared_name = None
+            # Only plain queries are prepared; DDL and utility statements never are
+            if is_query and preparable:
+                prepared_name = self._get_prepared_statement(conn, sql_query)
             
-            cursor.execute(sql_query)
+            if prepared_name is not None:
+                # A prepared statement can't back a DECLAREd cursor, so it runs on a regular
+                # one, which receives the whole result at execute(); hence only bounded queries
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f"EXECUTE {prepared_name}")
+                except psycopg2.Error as e:
+                    cursor.close()
+                    self._forget_prepared_statement(conn, prepared_name)
+                    # "cached plan must not change result type": the table changed since
+                    # PREPARE, so run the query unprepared below instead
+                    if not isinstance(e, psycopg2.errors.FeatureNotSupported):
+                        raise
+                    prepared_name = None
+                else:
+                    has_rows = cursor.description is not None
             
-            # Fetch results (should only be SELECT queries now)
-            if cursor.description:  # SELECT query
-                results = [dict(row) for row in cursor.fetchall()]
-                row_count = len(results)
-            else:  # This shouldn't happen with read-only queries, but handle gracefully
-                results = []
-                row_count = 0
+            if prepared_name is None and is_query:
+                # Named (server-side) cursor: memory stays bounded no matter how many
+                # rows the query matches
+                cursor = conn.cursor(name='mcp_stream')
+                cursor.execute(sql_query)
+                has_rows = True
+            elif prepared_name is None:
+                # EXPLAIN, SHOW, etc. can't be declared as a cursor
+                cursor = conn.cursor()
+                cursor.execute(sql_query)
+                has_rows = cursor.description is not None
             
-            # No commit needed for read-only queries
+            results = []
+            size = 0
+            over_budget = False
+            while has_rows and len(results) < max_rows and not over_budget:
+                # On a named cursor each fetchmany() is one FETCH of that many rows
+                fetch_size = get_fetch_size(len(results), size, max_rows)
+                rows = cursor.fetchmany(fetch_size)
+                for row in rows:
+                    results.append(row)
+                    size += len(orjson.dumps(row, default=str))
+                    if size > BYTE_BUDGET:
+                        over_budget = True
+                        break
+                if len(rows) < fetch_size:
+                    break
+            # A named cursor only has a description once rows have been fetched
+            columns = [column.name for column in cursor.description] if cursor.description else []
+            
+            # No commit needed for read-only queries; the pool rolls back on return
             cursor.close()
-            conn.close()
+        return columns, results, over_budget
+    
+    async def _fetch_results_asyncpg(self, sql_query: str, max_rows: int) -> Tuple[List[str], List[tuple], bool]:
+        """Execute a user query with asyncpg; returns the same as _fetch_results_psycopg2."""
+        async with self.get_async_connection() as conn:
+            try:
+                return await self._stream_results_asyncpg(conn, sql_query, max_rows)
+            except asyncpg.exceptions.InvalidCachedStatementError:
+                # The table changed since the statement was cached, and asyncpg doesn't
+                # evict it for cursors; clear the cache and try once more
+                await conn.reload_schema_state()
+                return await self._stream_results_asyncpg(conn, sql_query, max_rows)
+    
+    async def _stream_results_asyncpg(self, conn, sql_query: str, max_rows: int) -> Tuple[List[str], List[tuple], bool]:
+        """Read up to max_rows rows, or BYTE_BUDGET bytes, of a query through an asyncpg cursor."""
+        columns = []
+        results = []
+        size = 0
+        over_budget = False
+        # Cursors need a transaction
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(sql_query)
+            while len(results) < max_rows and not over_budget:
+                fetch_size = get_fetch_size(len(results), size, max_rows)
+                records = await cursor.fetch(fetch_size)
+                for record in records:
+                    if not results:
+                        columns = list(record.keys())
+                    row = tuple(record)
+                    results.append(row)
+                    size += len(orjson.dumps(row, default=str))
+                    if size > BYTE_BUDGET:
+                        over_budget = True
+                        break
+                if len(records) < fetch_size:
+                    break
+        if not results:
+            # No record to take the names from; have the server describe the statement.
+            # Only done here because prepare() bypasses the statement cache
+            statement = await conn.prepare(sql_query)
+            columns = [attribute.name for attribute in statement.get_attributes()]
+        return columns, results, over_budget
+    
+    async def execute_query(self, sql_query: str, page_token: Optional[str] = None) -> QueryResult:
+        """Execute a SQL query and return results, one page of at most MAX_RESULTS rows at a time."""
+        # A burst of identical calls (e.g. retries, or parallel agents) runs the query once
+        key = (sql_query, page_token)
+        task = self._inflight_queries.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run_query(sql_query, page_token))
+            self._inflight_queries[key] = task
+            task.add_done_callback(lambda _: self._inflight_queries.pop(key, None))
+        # shield() so one cancelled caller doesn't cancel the query for everyone waiting on it
+        return await asyncio.shield(task)
+    
+    async def _run_query(self, sql_query: str, page_token: Optional[str] = None) -> QueryResult:
+        """Validate and run one query; see execute_query."""
+        start_time = time.time()
+        
+        # Validate the SQL here so malformed or write queries never reach the database
+        error_msg = None
+        statement = None
+        try:
+            statements = parse_sql(sql_query)
+        except sqlglot.errors.SqlglotError as e:
+            error_msg = f"Invalid SQL: {describe_parse_error(e)}"
+        else:
+            # A comment after the final ';' parses as an empty Semicolon statement
+            statements = [s for s in statements if s is not None and not isinstance(s, exp.Semicolon)]
+            if not statements:
+                error_msg = "The query is empty."
+            elif len(statements) > 1:
+                error_msg = "Only one SQL statement can be run at a time."
+            else:
+                statement = statements[0]
+                keyword = find_write_operation(sql_query, statement)
+                if keyword:
+                    error_msg = f"This MCP server only allows read-only queries. The query contains '{keyword}' which is not permitted. Please use only SELECT queries to read data from the database."
+                elif not is_allowed_statement(statement):
+                    error_msg = "This MCP server only allows read-only queries: SELECT (including WITH and UNION), EXPLAIN and SHOW. Please use only SELECT queries to read data from the database."
+                if error_msg:
+                    logger.warning("Blocked non-read-only query: %s", sql_query)
+        
+        if error_msg:
+            return QueryResult(
+                sql_query=sql_query,
+                results=[],
+                row_count=0,
+                execution_time=time.time() - start_time,
+                error=error_msg
+            )
+        
+        try:
+            bounded_query, order_keys = bound_query(sql_query, statement, page_token)
+            # One row past the page tells us whether there is another page
+            max_rows = MAX_RESULTS + 1
+            
+            if self.driver == 'psycopg2':
+                row_limit = get_row_limit(statement)
+                preparable = row_limit is not None and row_limit <= max_rows
+                # psycopg2 blocks, so keep it off the event loop
+                loop = asyncio.get_running_loop()
+                columns, results, over_budget = await loop.run_in_executor(
+                    None, self._fetch_results_psycopg2, bounded_query, max_rows,
+                    isinstance(statement, exp.Query), preparable
+                )
+            else:
+                columns, results, over_budget = await self._fetch_results_asyncpg(bounded_query, max_rows)
+            
+            next_page_token = None
+            error = None
+            if over_budget or len(results) > MAX_RESULTS:
+                # Either way the last row isn't returned: it's past the page or over budget
+                next_row = results.pop()
+                last_row = results[-1] if results else None
+                if over_budget:
+                    error = (
+                        f"Result truncated at {BYTE_BUDGET} bytes after {len(results)} rows. "
+                        "Select fewer or narrower columns to see more."
+                    )
+                if last_row and order_keys and all(key in columns for key in order_keys[0]):
+                    indexes = [columns.index(key) for key in order_keys[0]]
+                    values = [last_row[i] for i in indexes]
+                    # Resuming after NULLs or after a key the next row shares would skip rows
+                    if None not in values and values != [next_row[i] for i in indexes]:
+                        next_page_token = encode_page_token(sql_query, values)
+                if not over_budget and next_page_token is None:
+                    # Without a token the client can't reach the rest, so say the list is cut short
+                    error = (
+                        f"More than {MAX_RESULTS} rows matched; only the first {MAX_RESULTS} are returned. "
+                        "Add an ORDER BY on unique columns (such as the primary key) to page through "
+                        "the rest, or narrow the query with WHERE or LIMIT."
+                    )
             
             execution_time = time.time() - start_time
             
             return QueryResult(
                 sql_query=sql_query,
+                columns=columns,
                 results=results,
-                row_count=row_count,
-                execution_time=execution_time
+                row_count=len(results),
+                execution_time=execution_time,
+                error=error,
+                next_page_token=next_page_token
             )
             
         except Exception as e:
             execution_time = time.time() - start_time
-            logger.error(f"Query execution failed: {e}")
+            logger.error("Query execution failed: %s", e)
+            if isinstance(e, SCHEMA_CHANGED_ERRORS):
+                self.invalidate_schema()
+            error = str(e)
+            if isinstance(e, QUERY_TIMEOUT_ERRORS):
+                error = f"Query timed out after {QUERY_TIMEOUT}s"
             return QueryResult(
                 sql_query=sql_query,
                 results=[],
                 row_count=0,
                 execution_time=execution_time,
-                error=str(e)
+                error=error
             )
     
-    def get_schema_info(self) -> str:
+    async def _fetch_schema_rows(self) -> List[tuple]:
+        """Fetch one row per column of every table in the public schema."""
+        if self.driver == 'psycopg2':
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._fetch_schema_rows_psycopg2)
+        # asyncpg's statement cache prepares it on first use, keyed by the SQL text
+        return await self.fetch_rows(SCHEMA_QUERY)
+    
+    async def _load_schema(self) -> Tuple[str, Dict[str, List[Dict[str, Any]]]]:
+        """Query the catalog once and build both the schema text and the structured tables."""
+        generation = self._schema_generation
+        schema_data = await self._fetch_schema_rows()
+        
+        # Format schema information
+        tables = {}
+        for row in schema_data:
+            table_name, column_name, data_type, nullable, column_default, max_length = row
+            if table_name not in tables:
+                tables[table_name] = []
+            
+            column_info = {
+                'column': column_name,
+                'type': data_type,
+                'nullable': nullable,
+                'default': column_default,
+                'max_length': max_length
+            }
+            tables[table_name].append(column_info)
+        
+        # Collect the pieces and join once; repeated += copies the whole string each time
+        parts = ["Database Schema:\n"]
+        for table_name, columns in tables.items():
+            parts.append(f"\nTable: {table_name}\n")
+            parts.extend(
+                f"  - {col['column']} ({col['type']}, nullable: {'YES' if col['nullable'] else 'NO'})\n"
+                for col in columns
+            )
+        schema_text = "".join(parts)
+        
+        schema = (schema_text, tables)
+        # Don't let a load that raced with invalidate_schema() repopulate the cache
+        if generation == self._schema_generation:
+            self._schema_cache = schema
+            self._schema_cache_ts = time.monotonic()
+        return schema
+    
+    def _start_schema_load(self) -> asyncio.Task:
+        """Start a schema load, or join the one already in flight."""
+        if self._schema_load_task is None or self._schema_load_task.done():
+            self._schema_load_task = asyncio.ensure_future(self._load_schema())
+        return self._schema_load_task
+    
+    async def _refresh_schema_in_background(self):
+        """Reload the schema while callers keep using the cached copy."""
+        try:
+            await self._start_schema_load()
+        except Exception as e:
+            logger.error("Background schema refresh failed: %s", e)
+    
+    async def get_schema(self) -> Tuple[str, Dict[str, List[Dict[str, Any]]]]:
+        """Get (schema_text, tables), served from cache for up to SCHEMA_CACHE_TTL seconds."""
+        age = time.monotonic() - self._schema_cache_ts
+        if self._schema_cache is not None and age < SCHEMA_CACHE_TTL:
+            # Refresh ahead of expiry so the catalog query stays off the request path
+            refresh_due = AUTO_REFRESH_SCHEMA and age > 0.8 * SCHEMA_CACHE_TTL
+            if refresh_due and (self._schema_refresh_task is None or self._schema_refresh_task.done()):
+                self._schema_refresh_task = asyncio.create_task(self._refresh_schema_in_background())
+            return self._schema_cache
+        
+        # shield() so one cancelled caller doesn't cancel the load for everyone waiting on it
+        return await asyncio.shield(self._start_schema_load())
+    
+    def invalidate_schema(self):
+        """Drop the cached schema so the next request reloads it."""
+        self._schema_generation += 1
+        self._schema_cache = None
+        self._schema_cache_ts = 0
+        self._schema_load_task = None
+    
+    async def get_schema_info(self) -> str:
         """Get database schema information to help with SQL generation."""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # Get table information
-            cursor.execute("""
-                SELECT 
-                    t.table_name,
-                    c.column_name,
-                    c.data_type,
-                    c.is_nullable
-                FROM information_schema.tables t
-                JOIN information_schema.columns c ON t.table_name = c.table_name
-                WHERE t.table_schema = 'public'
-                ORDER BY t.table_name, c.ordinal_position
-            """)
-            
-            schema_info = cursor.fetchall()
-            cursor.close()
-            conn.close()
-            
-            # Format schema information
-            tables = {}
-            for row in schema_info:
-                table_name, column_name, data_type, is_nullable = row
-                if table_name not in tables:
-                    tables[table_name] = []
-                tables[table_name].append({
-                    'column': column_name,
-                    'type': data_type,
-                    'nullable': is_nullable
-                })
-            
-            schema_text = "Database Schema:\n"
-            for table_name, columns in tables.items():
-                schema_text += f"\nTable: {table_name}\n"
-                for col in columns:
-                    schema_text += f"  - {col['column']} ({col['type']}, nullable: {col['nullable']})\n"
-            
+            schema_text, _ = await self.get_schema()
             return schema_text
             
         except Exception as e:
-            logger.error(f"Failed to get schema info: {e}")
+            logger.error("Failed to get schema info: %s", e)
             return "Unable to retrieve database schema information."
+    
+    async def get_schema_tables(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Get detailed column information for every table in the public schema."""
+        _, tables = await self.get_schema()
+        return tables
 
 
 
@@ -169,39 +960,65 @@ db_manager = DatabaseManager()
 # Create FastMCP server
 app = FastMCP("postgres-nl-query-server")
 
+# Static parts of the prompt natural_language_query hands back to the LLM client
+PROMPT_PREFIX = """
+Database Schema Information:
+"""
+PROMPT_SUFFIX = """
+
+Please generate a PostgreSQL SQL query based on the user's natural language request and the database schema above.
+The query should be safe, efficient, and return the requested data.
+
+Requirements:
+1. Use only the tables and columns available in the schema
+2. Use PostgreSQL syntax
+3. Include appropriate WHERE clauses for security
+4. Add LIMIT clauses for large result sets if appropriate
+5. Use proper JOINs when querying multiple tables
+6. Return only the SQL query, no explanations
+
+Generated SQL Query:
+"""
+
 @app.tool()
 async def execute_sql_query(input_data: SQLQuery) -> QueryResult:
     """
     Execute a read-only SQL query against the PostgreSQL database and return the results.
     
     This tool takes a SQL query and executes it directly against the database.
-    ONLY SELECT queries are allowed - all INSERT, UPDATE, DELETE, ALTER, DROP, CREATE,
-    TRUNCATE, GRANT, and REVOKE operations are blocked for security.
+    ONLY SELECT queries are allowed - all INSERT, UPDATE, DELETE, MERGE, ALTER, DROP, CREATE,
+    TRUNCATE, GRANT, REVOKE, and COPY operations are blocked for security, as is any
+    other statement besides EXPLAIN and SHOW. Invalid SQL is rejected before it reaches
+    the database.
     The LLM client (like Claude Desktop, Copilot, etc.) should handle the conversion
     from natural language to SQL and any result transformation.
     
+    Results are returned in pages of at most MAX_RESULTS rows. When a query is ordered
+    by unique columns (such as the primary key), next_page_token is set if more rows
+    remain; call this tool again with the same sql_query and that page_token to continue.
+    
     Examples:
     - "SELECT * FROM users WHERE created_at >= NOW() - INTERVAL '1 month'"
     - "SELECT product_name, SUM(sales_amount) FROM sales GROUP BY product_name ORDER BY SUM(sales_amount) DESC LIMIT 10"
     - "SELECT customer_id, COUNT(*) as order_count FROM orders GROUP BY customer_id"
     """
     try:
-        logger.info(f"Executing SQL query: {input_data.sql_query}")
+        logger.info("Executing SQL query: %s", input_data.sql_query)
         
         # Execute the query
-        result = db_manager.execute_query(input_data.sql_query)
+        result = await db_manager.execute_query(input_data.sql_query, input_data.page_token)
         
-        return result
+        return to_tool_result(result)
         
     except Exception as e:
-        logger.error(f"Error in SQL query execution tool: {e}")
-        return QueryResult(
+        logger.error("Error in SQL query execution tool: %s", e)
+        return to_tool_result(QueryResult(
             sql_query=input_data.sql_query,
             results=[],
             row_count=0,
             execution_time=0.0,
             error=str(e)
-        )
+        ))
 
 @app.tool()
 async def natural_language_query(input_data: str) -> QueryResult:
@@ -220,56 +1037,39 @@ async def natural_language_query(input_data: str) -> QueryResult:
     - "Get the total revenue for each month this year"
     """
     try:
-        logger.info(f"Processing natural language query: {input_data}")
+        logger.info("Processing natural language query: %s", input_data)
         
         # Get database schema information
-        schema_info = db_manager.get_schema_info()
+        schema_info = await db_manager.get_schema_info()
         logger.info("Retrieved database schema information")
         
-        # Create a comprehensive prompt for the LLM client
-        prompt_context = f"""
-Database Schema Information:
-{schema_info}
-
-User Query: {input_data}
-
-Please generate a PostgreSQL SQL query based on the user's natural language request and the database schema above.
-The query should be safe, efficient, and return the requested data.
-
-Requirements:
-1. Use only the tables and columns available in the schema
-2. Use PostgreSQL syntax
-3. Include appropriate WHERE clauses for security
-4. Add LIMIT clauses for large result sets if appropriate
-5. Use proper JOINs when querying multiple tables
-6. Return only the SQL query, no explanations
-
-Generated SQL Query:
-"""
+        # Create a comprehensive prompt for the LLM client; only the schema and query vary
+        prompt_context = PROMPT_PREFIX + schema_info + "\n\nUser Query: " + input_data + PROMPT_SUFFIX
         
         # Return a special result that includes the prompt for the LLM client
-        return QueryResult(
+        return to_tool_result(QueryResult(
             sql_query=prompt_context,
-            results=[{
-                "message": "Please use the LLM client to generate SQL from the provided context and schema information, then call execute_sql_query with the generated SQL.",
-                "schema_info": schema_info,
-                "user_query": input_data,
-                "next_step": "Call execute_sql_query with the generated SQL"
-            }],
+            columns=["message", "schema_info", "user_query", "next_step"],
+            results=[[
+                "Please use the LLM client to generate SQL from the provided context and schema information, then call execute_sql_query with the generated SQL.",
+                schema_info,
+                input_data,
+                "Call execute_sql_query with the generated SQL"
+            ]],
             row_count=1,
             execution_time=0.0,
             error=None
-        )
+        ))
         
     except Exception as e:
-        logger.error(f"Error in natural language query tool: {e}")
-        return QueryResult(
+        logger.error("Error in natural language query tool: %s", e)
+        return to_tool_result(QueryResult(
             sql_query="",
             results=[],
             row_count=0,
             execution_time=0.0,
             error=str(e)
-        )
+        ))
 
 @app.tool()
 async def get_database_schema() -> Dict[str, Any]:
@@ -288,46 +1088,9 @@ async def get_database_schema() -> Dict[str, Any]:
     try:
         logger.info("Retrieving database schema information")
         
-        schema_info = db_manager.get_schema_info()
+        schema_info = await db_manager.get_schema_info()
         
-        # Get detailed table information
-        conn = db_manager.get_connection()
-        cursor = conn.cursor()
-        
-        # Get table information
-        cursor.execute("""
-            SELECT 
-                t.table_name,
-                c.column_name,
-                c.data_type,
-                c.is_nullable,
-                c.column_default,
-                c.character_maximum_length
-            FROM information_schema.tables t
-            JOIN information_schema.columns c ON t.table_name = c.table_name
-            WHERE t.table_schema = 'public'
-            ORDER BY t.table_name, c.ordinal_position
-        """)
-        
-        schema_data = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        # Format schema information
-        tables = {}
-        for row in schema_data:
-            table_name, column_name, data_type, is_nullable, column_default, max_length = row
-            if table_name not in tables:
-                tables[table_name] = []
-            
-            column_info = {
-                'column': column_name,
-                'type': data_type,
-                'nullable': is_nullable == 'YES',
-                'default': column_default,
-                'max_length': max_length
-            }
-            tables[table_name].append(column_info)
+        tables = await db_manager.get_schema_tables()
         
         return {
             "tables": tables,
@@ -337,7 +1100,7 @@ async def get_database_schema() -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Error retrieving database schema: {e}")
+        logger.error("Error retrieving database schema: %s", e)
         return {
             "tables": {},
             "table_count": 0,
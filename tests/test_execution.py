@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import mcp_server
+from mcp_server import decode_page_token, get_fetch_size
+
+
+def make_db(fetch_results=None, fetch_schema_rows=None):
+    """A DatabaseManager whose database calls are replaced by the given coroutines."""
+    db = mcp_server.DatabaseManager()
+    db.driver = 'asyncpg'
+    if fetch_results is not None:
+        db._fetch_results_asyncpg = fetch_results
+    if fetch_schema_rows is not None:
+        db._fetch_schema_rows = fetch_schema_rows
+    return db
+
+
+def test_identical_queries_run_once():
+    calls = []
+
+    async def fetch_results(sql, max_rows):
+        calls.append(sql)
+        await asyncio.sleep(0.01)
+        return ['id'], [(1,)], False
+
+    db = make_db(fetch_results)
+
+    async def run():
+        results = await asyncio.gather(*(db.execute_query("SELECT 1 AS id") for _ in range(5)))
+        # Once the query has finished, the next call runs it again
+        await db.execute_query("SELECT 1 AS id")
+        return results
+
+    results = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+    assert results[0].results == [(1,)]
+    assert db._inflight_queries == {}
+
+
+def test_cancelled_caller_does_not_cancel_shared_query():
+    async def fetch_results(sql, max_rows):
+        await asyncio.sleep(0.01)
+        return ['id'], [(1,)], False
+
+    db = make_db(fetch_results)
+
+    async def run():
+        first = asyncio.ensure_future(db.execute_query("SELECT 1 AS id"))
+        second = asyncio.ensure_future(db.execute_query("SELECT 1 AS id"))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()).results == [(1,)]
+
+
+def test_over_budget_result_is_truncated():
+    async def fetch_results(sql, max_rows):
+        # The last row is the one that went over the budget
+        return ['id', 'pad'], [(1, 'x'), (2, 'x'), (3, 'x')], True
+
+    sql_query = "SELECT id, pad FROM users ORDER BY id"
+    result = asyncio.run(make_db(fetch_results).execute_query(sql_query))
+    assert result.results == [(1, 'x'), (2, 'x')]
+    assert result.row_count == 2
+    assert result.error.startswith(f"Result truncated at {mcp_server.BYTE_BUDGET} bytes after 2 rows.")
+    assert decode_page_token(sql_query, result.next_page_token) == [2]
+
+
+def test_fetch_size_follows_byte_budget(monkeypatch):
+    monkeypatch.setattr(mcp_server, 'BYTE_BUDGET', 20000)
+    assert get_fetch_size(0, 0, 1001) == mcp_server.FETCH_SIZE
+    assert get_fetch_size(0, 0, 10) == 10
+    # 100 rows of 100 bytes: room for 100 more, plus the one that goes over
+    assert get_fetch_size(100, 10000, 1001) == 101
+    assert get_fetch_size(100, 1000, 1001) == 901
+    assert get_fetch_size(100, 20000, 1001) == 1
+
+
+SCHEMA_ROWS = [('users', 'id', 'integer', False, None, None)]
+
+
+def test_concurrent_schema_requests_load_once():
+    calls = []
+
+    async def fetch_schema_rows():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return SCHEMA_ROWS
+
+    db = make_db(fetch_schema_rows=fetch_schema_rows)
+
+    async def run():
+        return await asyncio.gather(*(db.get_schema() for _ in range(5)))
+
+    schemas = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(schema is schemas[0] for schema in schemas)
+    assert schemas[0][1] == {'users': [
+        {'column': 'id', 'type': 'integer', 'nullable': False, 'default': None, 'max_length': None}
+    ]}
+
+
+def test_schema_refreshes_in_background_before_expiry(monkeypatch):
+    monkeypatch.setattr(mcp_server, 'AUTO_REFRESH_SCHEMA', True)
+    loads = [SCHEMA_ROWS, SCHEMA_ROWS + [('orders', 'id', 'integer', False, None, None)]]
+
+    async def fetch_schema_rows():
+        return loads.pop(0)
+
+    db = make_db(fetch_schema_rows=fetch_schema_rows)
+
+    async def run():
+        _, tables = await db.get_schema()
+        assert list(tables) == ['users']
+        # Past 80% of the TTL the cached copy is still served, and a reload starts
+        db._schema_cache_ts = time.monotonic() - 0.9 * mcp_server.SCHEMA_CACHE_TTL
+        _, tables = await db.get_schema()
+        assert list(tables) == ['users']
+        await db._schema_refresh_task
+        _, tables = await db.get_schema()
+        return tables
+
+    assert list(asyncio.run(run())) == ['users', 'orders']
+    assert loads == []
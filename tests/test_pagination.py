@@ -0,0 +1,80 @@
+import pytest
+
+import mcp_server
+from mcp_server import bound_query, encode_page_token, parse_sql
+
+
+def bound(sql_query, page_token=None):
+    return bound_query(sql_query, parse_sql(sql_query)[0], page_token)
+
+
+@pytest.mark.parametrize("sql_query, expected, outer_order", [
+    ("SELECT id, name FROM users ORDER BY id", (["id"], False), '"_sub"."id"'),
+    ("SELECT id, name FROM users ORDER BY id DESC", (["id"], True), '"_sub"."id" DESC'),
+    ("SELECT id, name FROM users ORDER BY 2, 1", (["name", "id"], False), '"_sub"."name", "_sub"."id"'),
+    ("SELECT u.id AS user_id, o.amount FROM users u JOIN orders o ON o.user_id = u.id ORDER BY u.id", (["user_id"], False), '"_sub"."user_id"'),
+    ("SELECT Name FROM users ORDER BY Name", (["name"], False), '"_sub"."name"'),
+    ('SELECT "Name" FROM users ORDER BY "Name"', (["Name"], False), '"_sub"."Name"'),
+    ("SELECT * FROM users ORDER BY id", (["id"], False), '"_sub"."id"'),
+    ("SELECT * FROM users u ORDER BY u.id", (["id"], False), '"_sub"."id"'),
+    ("SELECT id FROM users ORDER BY id DESC NULLS LAST", (["id"], True), '"_sub"."id" DESC NULLS LAST'),
+    ("SELECT id FROM users ORDER BY id NULLS FIRST", (["id"], False), '"_sub"."id" NULLS FIRST'),
+])
+def test_order_keys_resolve_to_output_columns(sql_query, expected, outer_order):
+    bounded_query, order_keys = bound(sql_query)
+    assert order_keys == expected
+    assert bounded_query.endswith(f") AS _sub ORDER BY {outer_order} LIMIT {mcp_server.MAX_RESULTS + 1}")
+
+
+@pytest.mark.parametrize("sql_query", [
+    # Not in the select list
+    "SELECT name, email FROM users ORDER BY created_at DESC",
+    # Unaliased expressions have no usable name
+    "SELECT x, count(*) FROM t GROUP BY x ORDER BY 2",
+    "SELECT id FROM users ORDER BY lower(name)",
+    # The star could hide a second column with the same name
+    "SELECT *, id FROM users ORDER BY id",
+    "SELECT * FROM users u JOIN orders o ON o.user_id = u.id ORDER BY u.id",
+    "SELECT * FROM users u ORDER BY x.id",
+    # Mixed directions can't be expressed as one row comparison
+    "SELECT id, name FROM users ORDER BY id, name DESC",
+])
+def test_unresolvable_order_is_not_paginated(sql_query):
+    bounded_query, order_keys = bound(sql_query)
+    assert order_keys is None
+    assert bounded_query.endswith(f") AS _sub LIMIT {mcp_server.MAX_RESULTS + 1}")
+
+
+def test_outer_order_uses_folded_output_name():
+    bounded_query, _ = bound("SELECT u.Id AS UserId FROM users u ORDER BY u.Id DESC")
+    assert bounded_query.endswith(f'ORDER BY "_sub"."userid" DESC LIMIT {mcp_server.MAX_RESULTS + 1}')
+
+
+def test_page_token_resumes_after_last_key():
+    sql_query = "SELECT id, name FROM users ORDER BY id"
+    bounded_query, _ = bound(sql_query, encode_page_token(sql_query, [1000]))
+    assert 'WHERE ("_sub"."id") > (1000) ORDER BY "_sub"."id"' in bounded_query
+
+
+def test_page_token_rejected_for_other_query():
+    token = encode_page_token("SELECT id FROM users ORDER BY id", [1000])
+    with pytest.raises(ValueError):
+        bound("SELECT id FROM orders ORDER BY id", token)
+
+
+def test_query_with_limit_runs_unchanged():
+    sql_query = "SELECT id FROM users ORDER BY id LIMIT 5"
+    assert bound(sql_query) == (sql_query, None)
+
+
+@pytest.mark.parametrize("sql_query, expected", [
+    ("SELECT id FROM users", mcp_server.MAX_RESULTS + 1),
+    ("SELECT id FROM users LIMIT 10", 10),
+    ("SELECT id FROM users LIMIT 10 OFFSET 5", 10),
+    ("SELECT id FROM users FETCH FIRST 7 ROWS ONLY", 7),
+    ("SELECT id FROM users LIMIT ALL", None),
+    ("SELECT id FROM users LIMIT (SELECT 5)", None),
+    ("EXPLAIN SELECT id FROM users", None),
+])
+def test_row_limit(sql_query, expected):
+    assert mcp_server.get_row_limit(parse_sql(sql_query)[0]) == expected
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import mcp_server
+from mcp_server import find_write_operation, is_allowed_statement, parse_sql
+
+
+def validate(sql_query):
+    """Run a query that is rejected before it would reach the database."""
+    return asyncio.run(mcp_server.DatabaseManager().execute_query(sql_query))
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT id, created_at FROM users",
+    "SELECT 'update me' AS note",
+    "WITH recent AS (SELECT * FROM orders) SELECT count(*) FROM recent",
+    "SELECT 1 UNION SELECT 2",
+    "EXPLAIN SELECT * FROM users",
+    "SHOW work_mem",
+])
+def test_read_statements_are_allowed(sql_query):
+    statement = parse_sql(sql_query)[0]
+    assert find_write_operation(sql_query, statement) is None
+    assert is_allowed_statement(statement)
+
+
+@pytest.mark.parametrize("sql_query, keyword", [
+    ("DELETE FROM users", "DELETE"),
+    ("WITH gone AS (DELETE FROM users RETURNING *) SELECT * FROM gone", "DELETE"),
+    ("SELECT * INTO backup FROM users", "SELECT INTO"),
+    ("EXPLAIN ANALYZE UPDATE users SET name = ''", "UPDATE"),
+    ("COPY users TO '/tmp/users.csv'", "COPY"),
+])
+def test_writes_are_blocked(sql_query, keyword):
+    assert find_write_operation(sql_query, parse_sql(sql_query)[0]) == keyword
+
+
+@pytest.mark.parametrize("sql_query", [
+    "DEALLOCATE ALL",
+    "DEALLOCATE mcp_schema_v1",
+    "SET work_mem = '1GB'",
+    "VACUUM users",
+    "DO $$ BEGIN END $$",
+])
+def test_other_statements_are_rejected(sql_query):
+    result = validate(sql_query)
+    assert result.error.startswith("This MCP server only allows read-only queries")
+
+
+def test_invalid_sql_error_is_plain_text():
+    result = validate("SELECT 1 +")
+    assert result.error.startswith("Invalid SQL: ")
+    assert "(line 1, column 10)" in result.error
+    assert "\x1b" not in result.error
+
+
+def test_unterminated_string_is_invalid():
+    assert validate("SELECT 'abc").error.startswith("Invalid SQL: ")
+
+
+def test_multiple_statements_are_rejected():
+    assert validate("SELECT 1; SELECT 2").error == "Only one SQL statement can be run at a time."
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT 1;",
+    "SELECT 1; -- done",
+    "SELECT 1; /* done */",
+])
+def test_trailing_comment_is_not_a_statement(sql_query):
+    async def fetch_results(sql, max_rows):
+        return ['?column?'], [(1,)], False
+
+    db = mcp_server.DatabaseManager()
+    db.driver = 'asyncpg'
+    db._fetch_results_asyncpg = fetch_results
+    result = asyncio.run(db.execute_query(sql_query))
+    assert result.error is None
+    assert result.results == [(1,)]